@@ -1,18 +1,30 @@
 import argparse
-import re
+import logging
+from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
 
 from nexus_allowlist.nexus import NexusAPI, RepositoryType
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Repository:
     repo_type: RepositoryType
     name: str
     remote_url: str
 
 
+@dataclass(frozen=True, slots=True)
+class ContentSelector:
+    name: str
+    description: str
+    expression: str
+    repo_type: RepositoryType
+    repo: str
+
+
 _NEXUS_REPOSITORIES = {
     "pypi_proxy": Repository(
         repo_type=RepositoryType.PYPI,
@@ -26,6 +38,81 @@ _NEXUS_REPOSITORIES = {
     ),
 }
 
+# Content selectors which are always needed for the proxies to be usable
+_STATIC_CONTENT_SELECTORS = (
+    # Content selector for PyPI 'simple' path, used to search for packages
+    ContentSelector(
+        name="simple",
+        description="Allow access to 'simple' directory in PyPI repository",
+        expression='format == "pypi" and path=^"/simple"',
+        repo_type=_NEXUS_REPOSITORIES["pypi_proxy"].repo_type,
+        repo=_NEXUS_REPOSITORIES["pypi_proxy"].name,
+    ),
+    # Content selector for CRAN 'PACKAGES' file which contains an index of
+    # all packages
+    ContentSelector(
+        name="packages",
+        description="Allow access to 'PACKAGES' file in CRAN repository",
+        expression='format == "r" and path=="/src/contrib/PACKAGES"',
+        repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
+        repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
+    ),
+    # Content selector for CRAN 'archive.rds' file which contains an
+    # metadata for all archived packages
+    ContentSelector(
+        name="archive",
+        description="Allow access to 'archive.rds' file in CRAN repository",
+        expression='format == "r" and path=="/src/contrib/Meta/archive.rds"',
+        repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
+        repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
+    ),
+)
+
+# Content selectors used when allowing all packages
+_ALL_PACKAGES_CONTENT_SELECTORS = (
+    # Allow all PyPI packages
+    ContentSelector(
+        name="pypi-all",
+        description="Allow access to all PyPI packages",
+        expression='format == "pypi" and path=^"/packages/"',
+        repo_type=_NEXUS_REPOSITORIES["pypi_proxy"].repo_type,
+        repo=_NEXUS_REPOSITORIES["pypi_proxy"].name,
+    ),
+    # Allow all CRAN packages
+    ContentSelector(
+        name="cran-all",
+        description="Allow access to all CRAN packages",
+        expression='format == "r" and path=^"/src/contrib"',
+        repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
+        repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
+    ),
+)
+
+# Runs of '.', '_' and '-' are equivalent in PyPI package names
+# https://packaging.python.org/en/latest/guides/distributing-packages-using-setuptools/#name
+_PYPI_SEPARATORS = str.maketrans("._", "--")
+
+
+def _normalise_pypi_names(text: str) -> str:
+    # PyPI names are case-insensitive, convert to lower case and replace strings
+    # of '.', '_' or '-' with '-'
+    text = text.lower().translate(_PYPI_SEPARATORS)
+    while "--" in text:
+        text = text.replace("--", "-")
+    return text
+
+
+def _normalise_cran_names(text: str) -> str:
+    # Leave CRAN names alone to prevent issues with case-sensitivity
+    return text
+
+
+# Normalisers for the text of an allowlist, none of these may join or split lines
+_NORMALISERS: dict[RepositoryType, Callable[[str], str]] = {
+    RepositoryType.PYPI: _normalise_pypi_names,
+    RepositoryType.CRAN: _normalise_cran_names,
+}
+
 
 def check_package_files(args: argparse.Namespace) -> None:
     """
@@ -35,12 +122,12 @@ def check_package_files(args: argparse.Namespace) -> None:
         args: Command line arguments
 
     raise:
-        Exception: if any declared allowlist file does not exist
+        FileNotFoundError: if any declared allowlist file does not exist
     """
-    for package_file in [args.pypi_package_file, args.cran_package_file]:
+    for package_file in (args.pypi_package_file, args.cran_package_file):
         if package_file and not package_file.is_file():
             msg = f"Package allowlist file {package_file} does not exist"
-            raise Exception(msg)
+            raise FileNotFoundError(msg)
 
 
 def get_allowlists(
@@ -78,28 +165,27 @@ def get_allowlist(allowlist_path: Path, repo_type: RepositoryType) -> list[str]:
         repo_type: The type of repository the allowlist applies to
 
     Returns:
-        List of the package names specified in the file
+        List of the unique package names specified in the file, in the order
+        they first appear
+
+    raise:
+        FileNotFoundError: if the allowlist file does not exist
     """
-    allowlist = []
-    with open(allowlist_path) as allowlist_file:
-        # Sanitise package names
-        # - convert to lower case if the package is on PyPI. Leave alone on CRAN to
-        #   prevent issues with case-sensitivity - for PyPI replace strings of '.', '_'
-        #   or '-' with '-'
-        #   https://packaging.python.org/en/latest/guides/distributing-packages-using-setuptools/#name
-        # - remove any blank entries, which act as a wildcard that would allow any
-        #   package
-        pypi_replace_characters = re.compile(r"[\._-]+")
-        for package_name in allowlist_file.readlines():
-            match repo_type:
-                case RepositoryType.CRAN:
-                    package_name_parsed = package_name.strip()
-                case RepositoryType.PYPI:
-                    package_name_parsed = pypi_replace_characters.sub(
-                        "-", package_name.lower().strip()
-                    )
-            allowlist.append(package_name_parsed)
-    return allowlist
+    # Sanitise package names
+    # - normalise according to the repository type, over the whole file at once
+    # - remove any blank entries, which act as a wildcard that would allow any
+    #   package
+    try:
+        allowlist_text = allowlist_path.read_text(encoding="utf-8")
+    except FileNotFoundError as exc:
+        msg = f"Package allowlist file {allowlist_path} does not exist"
+        raise FileNotFoundError(msg) from exc
+    allowlist_text = _NORMALISERS[repo_type](allowlist_text)
+    package_names = (line.strip() for line in allowlist_text.splitlines())
+
+    # Remove duplicates, which would otherwise be created twice, keeping the first
+    # occurrence of each package
+    return list(dict.fromkeys(name for name in package_names if name))
 
 
 def recreate_repositories(nexus_api: NexusAPI) -> None:
@@ -112,12 +198,14 @@ def recreate_repositories(nexus_api: NexusAPI) -> None:
     # Delete all existing repositories
     nexus_api.delete_all_repositories()
 
-    for repository in _NEXUS_REPOSITORIES.values():
-        nexus_api.create_proxy_repository(
+    nexus_api.map_concurrently(
+        lambda repository: nexus_api.create_proxy_repository(
             repo_type=repository.repo_type,
             name=repository.name,
             remote_url=repository.remote_url,
-        )
+        ),
+        _NEXUS_REPOSITORIES.values(),
+    )
 
 
 def recreate_privileges(
@@ -130,6 +218,9 @@ def recreate_privileges(
     Create content selectors and content selector privileges based on the
     package setting and allowlists in an idempotent manner
 
+    Content selectors and privileges which already exist are only changed if
+    their expression differs, and those which are no longer needed are deleted.
+
     Args:
         nexus_api: NexusAPI object
         pypi_allowlist: List of allowed PyPI packages
@@ -138,94 +229,32 @@ def recreate_privileges(
     Returns:
         List of the names of all content selector privileges
     """
-    # Delete all existing content selector privileges
-    # These must be deleted before the content selectors as the content selectors
-    # as the privileges depend on the content selectors
-    nexus_api.delete_all_content_selector_privileges()
-
-    # Delete all existing content selectors
-    nexus_api.delete_all_content_selectors()
+    pypi_repo_type = _NEXUS_REPOSITORIES["pypi_proxy"].repo_type
+    pypi_repo = _NEXUS_REPOSITORIES["pypi_proxy"].name
+    cran_repo_type = _NEXUS_REPOSITORIES["cran_proxy"].repo_type
+    cran_repo = _NEXUS_REPOSITORIES["cran_proxy"].name
 
-    pypi_privilege_names = []
-    cran_privilege_names = []
+    content_selectors = list(_STATIC_CONTENT_SELECTORS)
 
-    # Content selector and privilege for PyPI 'simple' path, used to search for
-    # packages
-    privilege_name = create_content_selector_and_privilege(
-        nexus_api,
-        name="simple",
-        description="Allow access to 'simple' directory in PyPI repository",
-        expression='format == "pypi" and path=^"/simple"',
-        repo_type=_NEXUS_REPOSITORIES["pypi_proxy"].repo_type,
-        repo=_NEXUS_REPOSITORIES["pypi_proxy"].name,
-    )
-    pypi_privilege_names.append(privilege_name)
-
-    # Content selector and privilege for CRAN 'PACKAGES' file which contains an
-    # index of all packages
-    privilege_name = create_content_selector_and_privilege(
-        nexus_api,
-        name="packages",
-        description="Allow access to 'PACKAGES' file in CRAN repository",
-        expression='format == "r" and path=="/src/contrib/PACKAGES"',
-        repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
-        repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
-    )
-    cran_privilege_names.append(privilege_name)
-
-    # Content selector and privilege for CRAN 'archive.rds' file which contains an
-    # metadata for all archived packages
-    privilege_name = create_content_selector_and_privilege(
-        nexus_api,
-        name="archive",
-        description="Allow access to 'archive.rds' file in CRAN repository",
-        expression='format == "r" and path=="/src/contrib/Meta/archive.rds"',
-        repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
-        repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
-    )
-    cran_privilege_names.append(privilege_name)
-
-    # Create content selectors and privileges for packages according to the
-    # package setting
+    # Content selectors for packages according to the package setting
     if packages == "all":
-        # Allow all PyPI packages
-        privilege_name = create_content_selector_and_privilege(
-            nexus_api,
-            name="pypi-all",
-            description="Allow access to all PyPI packages",
-            expression='format == "pypi" and path=^"/packages/"',
-            repo_type=_NEXUS_REPOSITORIES["pypi_proxy"].repo_type,
-            repo=_NEXUS_REPOSITORIES["pypi_proxy"].name,
-        )
-        pypi_privilege_names.append(privilege_name)
-
-        # Allow all CRAN packages
-        privilege_name = create_content_selector_and_privilege(
-            nexus_api,
-            name="cran-all",
-            description="Allow access to all CRAN packages",
-            expression='format == "r" and path=^"/src/contrib"',
-            repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
-            repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
-        )
-        cran_privilege_names.append(privilege_name)
+        content_selectors += _ALL_PACKAGES_CONTENT_SELECTORS
     elif packages == "selected":
         # Allow selected PyPI packages
-        for package in pypi_allowlist:
-            privilege_name = create_content_selector_and_privilege(
-                nexus_api,
+        content_selectors += [
+            ContentSelector(
                 name=f"pypi-{package}",
                 description=f"Allow access to {package} on PyPI",
                 expression=f'format == "pypi" and path=^"/packages/{package}/"',
-                repo_type=_NEXUS_REPOSITORIES["pypi_proxy"].repo_type,
-                repo=_NEXUS_REPOSITORIES["pypi_proxy"].name,
+                repo_type=pypi_repo_type,
+                repo=pypi_repo,
             )
-            pypi_privilege_names.append(privilege_name)
+            for package in pypi_allowlist
+        ]
 
         # Allow selected CRAN packages
-        for package in cran_allowlist:
-            privilege_name = create_content_selector_and_privilege(
-                nexus_api,
+        content_selectors += [
+            ContentSelector(
                 name=f"cran-{package}",
                 description=f"allow access to {package} on CRAN",
                 expression=(
@@ -233,45 +262,89 @@ def recreate_privileges(
                     f'and (path=^"/src/contrib/{package}_" '
                     f'or path=^"/src/contrib/Archive/{package}/{package}_")'
                 ),
-                repo_type=_NEXUS_REPOSITORIES["cran_proxy"].repo_type,
-                repo=_NEXUS_REPOSITORIES["cran_proxy"].name,
+                repo_type=cran_repo_type,
+                repo=cran_repo,
             )
-            cran_privilege_names.append(privilege_name)
+            for package in cran_allowlist
+        ]
+
+    names = {content_selector.name for content_selector in content_selectors}
+
+    existing_privileges = set(nexus_api.list_content_selector_privileges())
+    existing_content_selectors = nexus_api.list_content_selectors()
+    logger.info(
+        "Content selectors: %d to create, %d to update, %d to delete",
+        len(names - existing_content_selectors.keys()),
+        sum(
+            existing_content_selectors[content_selector.name]
+            != content_selector.expression
+            for content_selector in content_selectors
+            if content_selector.name in existing_content_selectors
+        ),
+        len(existing_content_selectors.keys() - names),
+    )
 
-    return pypi_privilege_names + cran_privilege_names
+    # Delete content selector privileges and content selectors which are no longer
+    # needed
+    # The privileges must be deleted before the content selectors as the
+    # privileges depend on the content selectors
+    nexus_api.delete_content_selector_privileges(existing_privileges - names)
+    nexus_api.delete_content_selectors(existing_content_selectors.keys() - names)
+
+    return nexus_api.map_concurrently(
+        lambda content_selector: create_content_selector_and_privilege(
+            nexus_api,
+            content_selector,
+            existing_expression=existing_content_selectors.get(content_selector.name),
+            privilege_exists=content_selector.name in existing_privileges,
+        ),
+        content_selectors,
+    )
 
 
 def create_content_selector_and_privilege(
     nexus_api: NexusAPI,
-    name: str,
-    description: str,
-    expression: str,
-    repo_type: RepositoryType,
-    repo: str,
+    content_selector: ContentSelector,
+    existing_expression: str | None,
+    *,
+    privilege_exists: bool,
 ) -> str:
     """
-    Create a content selector and corresponding content selector privilege
+    Create a content selector and corresponding content selector privilege,
+    skipping any which already exist
 
     Args:
         nexus_api: NexusAPI object
-        name: Name shared by the content selector and content selector
-            privilege
-        description: Description shared by the content selector and content
-            selector privilege
-        expression: CSEL expression defining the content selector
-        repo_type: Type of repository the content selector privilege applies to
-        repo: Name of the repository the content selector privilege applies to
+        content_selector: Content selector to create, its name and description
+            are shared by the content selector privilege
+        existing_expression: CSEL expression of the existing content selector
+            with the same name, or None if there is no such content selector
+        privilege_exists: Whether a content selector privilege with the same
+            name already exists
+
+    Returns:
+        Name of the content selector privilege
     """
-    nexus_api.create_content_selector(
-        name=name, description=description, expression=expression
-    )
+    if existing_expression is None:
+        nexus_api.create_content_selector(
+            name=content_selector.name,
+            description=content_selector.description,
+            expression=content_selector.expression,
+        )
+    elif existing_expression != content_selector.expression:
+        nexus_api.update_content_selector(
+            name=content_selector.name,
+            description=content_selector.description,
+            expression=content_selector.expression,
+        )
 
-    nexus_api.create_content_selector_privilege(
-        name=name,
-        description=description,
-        repo_type=repo_type,
-        repo=repo,
-        content_selector=name,
-    )
+    if not privilege_exists:
+        nexus_api.create_content_selector_privilege(
+            name=content_selector.name,
+            description=content_selector.description,
+            repo_type=content_selector.repo_type,
+            repo=content_selector.repo,
+            content_selector=content_selector.name,
+        )
 
-    return name
+    return content_selector.name
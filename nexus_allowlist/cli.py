@@ -7,7 +7,7 @@ from pathlib import Path
 from nexus_allowlist import actions
 from nexus_allowlist.__about__ import __version__
 from nexus_allowlist.exceptions import InitialPasswordError
-from nexus_allowlist.nexus import NexusAPI
+from nexus_allowlist.nexus import DEFAULT_CONCURRENCY, NexusAPI
 
 logging.basicConfig(
     format="{asctime} {levelname}: {message}",
@@ -21,6 +21,44 @@ _ROLE_NAME = "nexus user"
 
 
 def main() -> None:
+    parser = _build_parser()
+    args = parser.parse_args()
+
+    args.func(args)
+
+
+def _positive_int(value: str) -> int:
+    """
+    Parse a command line argument which must be a positive integer
+
+    Args:
+        value: Argument as given on the command line
+
+    Returns:
+        The argument as an integer
+
+    raises:
+        argparse.ArgumentTypeError: If the argument is not an integer of at
+            least 1
+    """
+    try:
+        number = int(value)
+    except ValueError as exc:
+        msg = f"invalid int value: '{value}'"
+        raise argparse.ArgumentTypeError(msg) from exc
+    if number < 1:
+        msg = f"must be at least 1: '{value}'"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser, including the sub-commands
+
+    Returns:
+        The command line parser
+    """
     parser = argparse.ArgumentParser(description="Enforce allowlists for Nexus3")
     parser.add_argument(
         "--admin-password",
@@ -46,6 +84,15 @@ def main() -> None:
         default="",
         help="Context path of the Nexus server (default /)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help=(
+            "Maximum number of simultaneous requests to the Nexus server "
+            f"(default {DEFAULT_CONCURRENCY})"
+        ),
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -113,9 +160,7 @@ def main() -> None:
     )
     parser_update.set_defaults(func=update_allow_lists)
 
-    args = parser.parse_args()
-
-    args.func(args)
+    return parser
 
 
 def change_initial_password(args: argparse.Namespace) -> None:
@@ -140,26 +185,26 @@ def change_initial_password(args: argparse.Namespace) -> None:
         msg = "Initial password appears to have been already changed"
         raise InitialPasswordError(msg) from exc
 
-    nexus_api = NexusAPI(
+    with NexusAPI(
         password=initial_password,
         nexus_host=args.nexus_host,
         nexus_port=args.nexus_port,
         nexus_path=args.nexus_path,
-    )
-
-    nexus_api.change_admin_password(args.admin_password)
+        concurrency=args.concurrency,
+    ) as nexus_api:
+        nexus_api.change_admin_password(args.admin_password)
 
 
 def test_authentiation(args: argparse.Namespace) -> None:
-    nexus_api = NexusAPI(
+    with NexusAPI(
         password=args.admin_password,
         nexus_host=args.nexus_host,
         nexus_port=args.nexus_port,
         nexus_path=args.nexus_path,
-    )
-
-    if not nexus_api.test_auth():
-        sys.exit(1)
+        concurrency=args.concurrency,
+    ) as nexus_api:
+        if not nexus_api.test_auth():
+            sys.exit(1)
 
 
 def initial_configuration(args: argparse.Namespace) -> None:
@@ -180,33 +225,35 @@ def initial_configuration(args: argparse.Namespace) -> None:
     Args:
         args: Command line arguments
     """
-    actions.check_package_files(args)
+    # The allowlist files are only used when allowing selected packages
+    if args.packages == "selected":
+        actions.check_package_files(args)
 
-    nexus_api = NexusAPI(
+    with NexusAPI(
         password=args.admin_password,
         nexus_host=args.nexus_host,
         nexus_port=args.nexus_port,
         nexus_path=args.nexus_path,
-    )
-
-    # Ensure only desired repositories exist
-    actions.recreate_repositories(nexus_api)
+        concurrency=args.concurrency,
+    ) as nexus_api:
+        # Ensure only desired repositories exist
+        actions.recreate_repositories(nexus_api)
 
-    # Delete non-default roles
-    nexus_api.delete_all_custom_roles()
+        # Delete non-default roles
+        nexus_api.delete_all_custom_roles()
 
-    # Create a role for nexus allowlist
-    nexus_api.create_role(
-        name=_ROLE_NAME,
-        description="allows access to selected packages",
-        privileges=[],
-    )
+        # Create a role for nexus allowlist
+        nexus_api.create_role(
+            name=_ROLE_NAME,
+            description="allows access to selected packages",
+            privileges=[],
+        )
 
-    # Give anonymous users ONLY the nexus allowlist role
-    nexus_api.update_anonymous_user_roles([_ROLE_NAME])
+        # Give anonymous users ONLY the nexus allowlist role
+        nexus_api.update_anonymous_user_roles([_ROLE_NAME])
 
-    # Enable anonymous access
-    nexus_api.enable_anonymous_access()
+        # Enable anonymous access
+        nexus_api.enable_anonymous_access()
 
 
 def update_allow_lists(args: argparse.Namespace) -> None:
@@ -215,38 +262,40 @@ def update_allow_lists(args: argparse.Namespace) -> None:
     configuration of the Nexus server.
 
     The following steps will occur:
-        - Deleting all content selectors and content selector privileges
-        - Creating content selectors and content selector privileges according
-          to the packages setting and allowlists
+        - Deleting content selectors and content selector privileges which are
+          no longer needed
+        - Creating or updating content selectors and content selector privileges
+          according to the packages setting and allowlists
         - Updating the anonymous accounts only role role with the previously
         defined content selector privileges
 
     Args:
         args: Command line arguments
     """
-    actions.check_package_files(args)
-
-    nexus_api = NexusAPI(
+    # Parse allowlists, these are only used when allowing selected packages
+    if args.packages == "selected":
+        pypi_allowlist, cran_allowlist = actions.get_allowlists(
+            args.pypi_package_file, args.cran_package_file
+        )
+    else:
+        pypi_allowlist, cran_allowlist = [], []
+
+    with NexusAPI(
         password=args.admin_password,
         nexus_host=args.nexus_host,
         nexus_port=args.nexus_port,
         nexus_path=args.nexus_path,
-    )
-
-    # Parse allowlists
-    pypi_allowlist, cran_allowlist = actions.get_allowlists(
-        args.pypi_package_file, args.cran_package_file
-    )
-
-    # Recreate all content selectors and associated privileges according to the
-    # allowlists
-    privileges = actions.recreate_privileges(
-        args.packages, nexus_api, pypi_allowlist, cran_allowlist
-    )
-
-    # Grant privileges to the nexus allowlist role
-    nexus_api.update_role(
-        name=_ROLE_NAME,
-        description="allows access to selected packages",
-        privileges=privileges,
-    )
+        concurrency=args.concurrency,
+    ) as nexus_api:
+        # Recreate all content selectors and associated privileges according to
+        # the allowlists
+        privileges = actions.recreate_privileges(
+            args.packages, nexus_api, pypi_allowlist, cran_allowlist
+        )
+
+        # Grant privileges to the nexus allowlist role
+        nexus_api.update_role(
+            name=_ROLE_NAME,
+            description="allows access to selected packages",
+            privileges=privileges,
+        )
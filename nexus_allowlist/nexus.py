@@ -1,13 +1,55 @@
 import logging
-from enum import Enum
-from typing import Any
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum, IntEnum
+from typing import Any, TypeVar
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
-_REQUEST_TIMEOUT = 10
-
+logger = logging.getLogger(__name__)
 
-class ResponseCode(Enum):
+_REQUEST_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 16
+
+# Default roles which must never be deleted
+_PROTECTED_ROLES = frozenset({"nx-admin", "nx-anonymous"})
+
+# Settings shared by all proxy repositories, the name and remote URL are added
+# per repository
+_PROXY_REPOSITORY_PAYLOAD: dict[str, Any] = {
+    "online": True,
+    "storage": {
+        "blobStoreName": "default",
+        "strictContentTypeValidation": True,
+    },
+    "proxy": {
+        "contentMaxAge": 1440,
+        "metadataMaxAge": 1440,
+    },
+    "negativeCache": {"enabled": True, "timeToLive": 1440},
+    "httpClient": {
+        "blocked": False,
+        "autoBlock": True,
+    },
+}
+
+# Maximum number of characters of a response body to log, error pages from
+# proxies in front of Nexus can be large
+_RESPONSE_BODY_LOG_LIMIT = 512
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+def _log_response_body(response: requests.Response) -> None:
+    # Only decode the body if it will be logged
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error("%s", response.text[:_RESPONSE_BODY_LOG_LIMIT])
+
+
+class ResponseCode(IntEnum):
     OK = 200
     CREATED = 201
     NO_CONTENT = 204
@@ -18,6 +60,10 @@ class ResponseCode(Enum):
     INTERNAL_SERVER_ERROR = 500
 
 
+# Responses meaning the credentials were rejected
+_AUTH_FAILURE_CODES = frozenset({ResponseCode.UNAUTHORIZED, ResponseCode.FORBIDDEN})
+
+
 class RepositoryType(Enum):
     PYPI = "pypi"
     CRAN = "r"
@@ -26,6 +72,18 @@ class RepositoryType(Enum):
 class NexusAPI:
     """Interface to the Nexus REST API"""
 
+    __slots__ = (
+        "_content_selectors_url",
+        "_privileges_url",
+        "_repositories_url",
+        "_roles_url",
+        "_users_url",
+        "concurrency",
+        "nexus_api_root",
+        "session",
+        "username",
+    )
+
     def __init__(
         self,
         *,
@@ -34,16 +92,128 @@ class NexusAPI:
         nexus_host: str,
         nexus_port: str,
         nexus_path: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
     ) -> None:
+        if concurrency < 1:
+            msg = f"concurrency must be at least 1, got {concurrency}"
+            raise ValueError(msg)
+
         self.nexus_api_root = (
             f"http://{nexus_host}:{nexus_port}{nexus_path}/service/rest"
         )
+        # URLs of the collections used by several methods
+        self._repositories_url = f"{self.nexus_api_root}/v1/repositories"
+        self._content_selectors_url = (
+            f"{self.nexus_api_root}/v1/security/content-selectors"
+        )
+        self._privileges_url = f"{self.nexus_api_root}/v1/security/privileges"
+        self._roles_url = f"{self.nexus_api_root}/v1/security/roles"
+        self._users_url = f"{self.nexus_api_root}/v1/security/users"
         self.username = username
-        self.password = password
+        self.concurrency = concurrency
+
+        # Share one session so connections to Nexus are kept alive and reused
+        self.session = requests.Session()
+        self.session.auth = requests.auth.HTTPBasicAuth(username, password)
+        self.session.mount(
+            "http://",
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=concurrency,
+                # Only idempotent methods are retried (the urllib3 default), a
+                # POST may have taken effect and Nexus answers some duplicate
+                # POSTs with 500
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.2,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    raise_on_status=False,
+                ),
+            ),
+        )
 
-    @property
-    def auth(self) -> requests.auth.HTTPBasicAuth:
-        return requests.auth.HTTPBasicAuth(self.username, self.password)
+    def __enter__(self) -> "NexusAPI":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close all connections to the Nexus server"""
+        self.session.close()
+
+    def map_concurrently(
+        self, func: Callable[[_T], _R], items: Iterable[_T]
+    ) -> list[_R]:
+        """
+        Apply a function to each item, running up to 'concurrency' calls at once
+
+        Each Nexus API call is an independent HTTP round-trip, so running them in
+        a thread pool hides the network latency of bulk operations.
+
+        Args:
+            func: Function to apply to each item
+            items: Items to apply the function to
+
+        Returns:
+            List of the results, in the same order as items
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(func, items))
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Send a request to the Nexus server
+
+        All requests go through here so that they share the session and timeout.
+
+        Args:
+            method: HTTP method
+            url: URL to send the request to
+            kwargs: Further arguments for requests.Session.request
+
+        Returns:
+            The response
+        """
+        return self.session.request(method, url, timeout=_REQUEST_TIMEOUT, **kwargs)
+
+    def _delete_each(
+        self, collection_url: str, kind: str, names: Iterable[str]
+    ) -> None:
+        """
+        Concurrently delete several items from the same collection
+
+        Args:
+            collection_url: URL of the collection
+            kind: Kind of item being deleted, used in log messages
+            names: Names of the items to delete
+        """
+
+        def delete(name: str) -> bool:
+            logger.debug("Deleting %s: %s", kind, name)
+            response = self._request("DELETE", f"{collection_url}/{name}")
+            code = response.status_code
+            if code == ResponseCode.NO_CONTENT:
+                logger.debug("%s %s successfully deleted", kind.capitalize(), name)
+                return True
+            else:
+                logger.error(
+                    "%s %s deletion failed.\nStatus code:%s",
+                    kind.capitalize(),
+                    name,
+                    code,
+                )
+                _log_response_body(response)
+                return False
+
+        results = self.map_concurrently(delete, names)
+        if results:
+            logger.info(
+                "%s deletion: %d succeeded, %d failed",
+                kind.capitalize(),
+                results.count(True),
+                results.count(False),
+            )
 
     def change_admin_password(self, new_password: str) -> None:
         """
@@ -52,45 +222,29 @@ class NexusAPI:
         Args:
             new_password: New password to be set
         """
-        logging.info(f"Old password: {self.password}")
-        logging.info(f"New password: {new_password}")
-        response = requests.put(
-            f"{self.nexus_api_root}/v1/security/users/admin/change-password",
-            auth=self.auth,
+        response = self._request(
+            "PUT",
+            f"{self._users_url}/admin/change-password",
             headers={"content-type": "text/plain"},
             data=new_password,
-            timeout=_REQUEST_TIMEOUT,
         )
-        if response.status_code == ResponseCode.NO_CONTENT.value:
-            logging.info("Changed admin password")
-            self.password = new_password
+        if response.status_code == ResponseCode.NO_CONTENT:
+            logger.info("Changed admin password")
+            self.session.auth = requests.auth.HTTPBasicAuth(self.username, new_password)
         else:
-            logging.error("Changing password failed")
-            logging.error(response.content)
+            logger.error("Changing password failed")
+            _log_response_body(response)
 
     def delete_all_repositories(self) -> None:
         """Delete all existing repositories"""
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/repositories",
-            auth=self.auth,
-            timeout=_REQUEST_TIMEOUT,
-        )
+        response = self._request("GET", self._repositories_url)
         repositories = response.json()
 
-        for repo in repositories:
-            name = repo["name"]
-            logging.info(f"Deleting repository: {name}")
-            response = requests.delete(
-                f"{self.nexus_api_root}/v1/repositories/{name}",
-                auth=self.auth,
-                timeout=_REQUEST_TIMEOUT,
-            )
-            code = response.status_code
-            if code == ResponseCode.NO_CONTENT.value:
-                logging.info("Repository successfully deleted")
-            else:
-                logging.error(f"Repository deletion failed.\nStatus code:{code}")
-                logging.error(response.content)
+        self._delete_each(
+            self._repositories_url,
+            "repository",
+            (repo["name"] for repo in repositories),
+        )
 
     def create_proxy_repository(
         self, repo_type: RepositoryType, name: str, remote_url: str
@@ -103,66 +257,48 @@ class NexusAPI:
             name: Name of the repository
             remote_url: Path of the repository to proxy
         """
-        payload: dict[str, Any] = {
-            "name": "",
-            "online": True,
-            "storage": {
-                "blobStoreName": "default",
-                "strictContentTypeValidation": True,
-            },
-            "proxy": {
-                "remoteUrl": "",
-                "contentMaxAge": 1440,
-                "metadataMaxAge": 1440,
-            },
-            "negativeCache": {"enabled": True, "timeToLive": 1440},
-            "httpClient": {
-                "blocked": False,
-                "autoBlock": True,
-            },
+        payload = {
+            **_PROXY_REPOSITORY_PAYLOAD,
+            "name": name,
+            "proxy": {**_PROXY_REPOSITORY_PAYLOAD["proxy"], "remoteUrl": remote_url},
         }
-        payload["name"] = name
-        payload["proxy"]["remoteUrl"] = remote_url
 
-        logging.info(f"Creating {repo_type.value} repository: {name}")
-        response = requests.post(
-            f"{self.nexus_api_root}/v1/repositories/{repo_type.value}/proxy",
-            auth=self.auth,
+        logger.info("Creating %s repository: %s", repo_type.value, name)
+        response = self._request(
+            "POST",
+            f"{self._repositories_url}/{repo_type.value}/proxy",
             json=payload,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.CREATED.value:
-            logging.info(f"{repo_type.value} proxy successfully created")
+        if code == ResponseCode.CREATED:
+            logger.info("%s proxy successfully created", repo_type.value)
         else:
-            logging.error(
-                f"{repo_type.value} proxy creation failed.\nStatus code: {code}"
-            )
-            logging.error(response.content)
-
-    def delete_all_content_selectors(self) -> None:
-        """Delete all existing content selectors"""
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/security/content-selectors",
-            auth=self.auth,
-            timeout=_REQUEST_TIMEOUT,
-        )
-        content_selectors = response.json()
-
-        for content_selector in content_selectors:
-            name = content_selector["name"]
-            logging.info(f"Deleting content selector: {name}")
-            response = requests.delete(
-                f"{self.nexus_api_root}/v1/security/content-selectors/{name}",
-                auth=self.auth,
-                timeout=_REQUEST_TIMEOUT,
+            logger.error(
+                "%s proxy creation failed.\nStatus code: %s", repo_type.value, code
             )
-            code = response.status_code
-            if code == ResponseCode.NO_CONTENT.value:
-                logging.info("Content selector successfully deleted")
-            else:
-                logging.error(f"Content selector deletion failed.\nStatus code:{code}")
-                logging.error(response.content)
+            _log_response_body(response)
+
+    def list_content_selectors(self) -> dict[str, str]:
+        """
+        List all existing content selectors
+
+        Returns:
+            Mapping of content selector names to their CSEL expressions
+        """
+        response = self._request("GET", self._content_selectors_url)
+        return {
+            content_selector["name"]: content_selector["expression"]
+            for content_selector in response.json()
+        }
+
+    def delete_content_selectors(self, names: Iterable[str]) -> None:
+        """
+        Delete content selectors
+
+        Args:
+            names: Names of the content selectors to delete
+        """
+        self._delete_each(self._content_selectors_url, "content selector", names)
 
     def create_content_selector(
         self, name: str, description: str, expression: str
@@ -182,50 +318,78 @@ class NexusAPI:
             "expression": expression,
         }
 
-        logging.info(f"Creating content selector: {name}")
-        response = requests.post(
-            f"{self.nexus_api_root}/v1/security/content-selectors",
-            auth=self.auth,
+        logger.debug("Creating content selector: %s", name)
+        response = self._request(
+            "POST",
+            self._content_selectors_url,
             json=payload,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.NO_CONTENT.value:
-            logging.info("content selector successfully created")
-        elif code == ResponseCode.INTERNAL_SERVER_ERROR.value:
-            logging.warning("content selector already exists")
+        if code == ResponseCode.NO_CONTENT:
+            logger.debug("content selector %s successfully created", name)
+        elif code == ResponseCode.INTERNAL_SERVER_ERROR:
+            logger.warning("content selector %s already exists", name)
         else:
-            logging.error(f"content selector creation failed.\nStatus code: {code}")
-            logging.error(response.content)
-
-    def delete_all_content_selector_privileges(self) -> None:
-        """Delete all existing content selector privileges"""
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/security/privileges",
-            auth=self.auth,
-            timeout=_REQUEST_TIMEOUT,
+            logger.error(
+                "content selector %s creation failed.\nStatus code: %s", name, code
+            )
+            _log_response_body(response)
+
+    def update_content_selector(
+        self, name: str, description: str, expression: str
+    ) -> None:
+        """
+        Update an existing content selector
+
+        Args:
+            name: Name of the content selector
+            description: Description of the content selector
+            expression: CSEL query to identify content
+        """
+        payload = {
+            "description": description,
+            "expression": expression,
+        }
+
+        logger.debug("Updating content selector: %s", name)
+        response = self._request(
+            "PUT",
+            f"{self._content_selectors_url}/{name}",
+            json=payload,
         )
-        privileges = response.json()
-
-        for privilege in privileges:
-            if privilege["type"] != "repository-content-selector":
-                continue
-
-            name = privilege["name"]
-            logging.info(f"Deleting content selector privilege: {name}")
-            response = requests.delete(
-                f"{self.nexus_api_root}/v1/security/privileges/{name}",
-                auth=self.auth,
-                timeout=_REQUEST_TIMEOUT,
+        code = response.status_code
+        if code == ResponseCode.NO_CONTENT:
+            logger.debug("content selector %s successfully updated", name)
+        elif code == ResponseCode.NOT_FOUND:
+            logger.warning("content selector %s does not exist", name)
+        else:
+            logger.error(
+                "content selector %s update failed.\nStatus code: %s", name, code
             )
-            code = response.status_code
-            if code == ResponseCode.NO_CONTENT.value:
-                logging.info(f"Content selector privilege: {name} successfully deleted")
-            else:
-                logging.error(
-                    f"Content selector privilege deletion failed. Status code:{code}"
-                )
-                logging.error(response.content)
+            _log_response_body(response)
+
+    def list_content_selector_privileges(self) -> list[str]:
+        """
+        List all existing content selector privileges
+
+        Returns:
+            Names of the content selector privileges
+        """
+        response = self._request("GET", self._privileges_url)
+        return [
+            privilege["name"]
+            for privilege in response.json()
+            if privilege["type"] == "repository-content-selector"
+        ]
+
+    def delete_content_selector_privileges(self, names: Iterable[str]) -> None:
+        """
+        Delete content selector privileges
+
+        Args:
+            names: Names of the content selector privileges to delete
+        """
+        self._delete_each(self._privileges_url, "content selector privilege", names)
 
     def create_content_selector_privilege(
         self,
@@ -255,54 +419,35 @@ class NexusAPI:
             "contentSelector": content_selector,
         }
 
-        logging.info(f"Creating content selector privilege: {name}")
-        response = requests.post(
-            (
-                f"{self.nexus_api_root}/v1/security/privileges"
-                "/repository-content-selector"
-            ),
-            auth=self.auth,
+        logger.debug("Creating content selector privilege: %s", name)
+        response = self._request(
+            "POST",
+            f"{self._privileges_url}/repository-content-selector",
             json=payload,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.CREATED.value:
-            logging.info(f"content selector privilege {name} successfully created")
-        elif code == ResponseCode.BAD_REQUEST.value:
-            logging.warning(f"content selector privilege {name} already exists")
+        if code == ResponseCode.CREATED:
+            logger.debug("content selector privilege %s successfully created", name)
+        elif code == ResponseCode.BAD_REQUEST:
+            logger.warning("content selector privilege %s already exists", name)
         else:
-            logging.error(
-                f"content selector privilege {name} creation failed."
-                f" Status code: {code}"
+            logger.error(
+                "content selector privilege %s creation failed. Status code: %s",
+                name,
+                code,
             )
-            logging.error(response.content)
+            _log_response_body(response)
 
     def delete_all_custom_roles(self) -> None:
         """Delete all roles except for the default 'nx-admin' and 'nx-anonymous'"""
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/security/roles",
-            auth=self.auth,
-            timeout=_REQUEST_TIMEOUT,
-        )
+        response = self._request("GET", self._roles_url)
         roles = response.json()
 
-        for role in roles:
-            name = role["name"]
-            if name in ["nx-admin", "nx-anonymous"]:
-                continue
-
-            logging.info(f"Deleting role: {name}")
-            response = requests.delete(
-                f"{self.nexus_api_root}/v1/security/roles/{name}",
-                auth=self.auth,
-                timeout=_REQUEST_TIMEOUT,
-            )
-            code = response.status_code
-            if code == ResponseCode.NO_CONTENT.value:
-                logging.info("Role successfully deleted")
-            else:
-                logging.error(f"Role deletion failed.\nStatus code:{code}")
-                logging.error(response.content)
+        self._delete_each(
+            self._roles_url,
+            "role",
+            (role["name"] for role in roles if role["name"] not in _PROTECTED_ROLES),
+        )
 
     def create_role(self, name: str, description: str, privileges: list[str]) -> None:
         """
@@ -322,21 +467,20 @@ class NexusAPI:
             "privileges": privileges,
         }
 
-        logging.info(f"Creating role: {name}")
-        response = requests.post(
-            (f"{self.nexus_api_root}/v1/security/roles"),
-            auth=self.auth,
+        logger.info("Creating role: %s", name)
+        response = self._request(
+            "POST",
+            self._roles_url,
             json=payload,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.OK.value:
-            logging.info(f"role {name} successfully created")
-        elif code == ResponseCode.BAD_REQUEST.value:
-            logging.warning(f"role {name} already exists")
+        if code == ResponseCode.OK:
+            logger.info("role %s successfully created", name)
+        elif code == ResponseCode.BAD_REQUEST:
+            logger.warning("role %s already exists", name)
         else:
-            logging.error(f"role {name} creation failed.\nStatus code: {code}")
-            logging.error(response.content)
+            logger.error("role %s creation failed.\nStatus code: %s", name, code)
+            _log_response_body(response)
 
     def update_role(self, name: str, description: str, privileges: list[str]) -> None:
         """
@@ -357,40 +501,38 @@ class NexusAPI:
             "privileges": privileges,
         }
 
-        logging.info(f"updating role: {name}")
-        response = requests.put(
-            (f"{self.nexus_api_root}/v1/security/roles/{name}"),
-            auth=self.auth,
+        logger.info("updating role: %s", name)
+        response = self._request(
+            "PUT",
+            f"{self._roles_url}/{name}",
             json=payload,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.NO_CONTENT.value:
-            logging.info(f"role {name} successfully created")
-        elif code == ResponseCode.NOT_FOUND.value:
-            logging.warning(f"role {name} does not exist")
+        if code == ResponseCode.NO_CONTENT:
+            logger.info("role %s successfully updated", name)
+        elif code == ResponseCode.NOT_FOUND:
+            logger.warning("role %s does not exist", name)
         else:
-            logging.error(f"role {name} update failed.\nStatus code: {code}")
-            logging.error(response.content)
+            logger.error("role %s update failed.\nStatus code: %s", name, code)
+            _log_response_body(response)
 
     def enable_anonymous_access(self) -> None:
         """Enable access from anonymous users (where no credentials are supplied)"""
-        response = requests.put(
+        response = self._request(
+            "PUT",
             f"{self.nexus_api_root}/v1/security/anonymous",
-            auth=self.auth,
             json={
                 "enabled": True,
                 "userId": "anonymous",
                 "realName": "Local Authorizing Realm",
             },
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.OK.value:
-            logging.info("Anonymous access enabled")
+        if code == ResponseCode.OK:
+            logger.info("Anonymous access enabled")
         else:
-            logging.error(f"Enabling anonymous access failed.\nStatus code: {code}")
-            logging.error(response.content)
+            logger.error("Enabling anonymous access failed.\nStatus code: %s", code)
+            _log_response_body(response)
 
     def update_anonymous_user_roles(self, roles: list[str]) -> None:
         """
@@ -401,53 +543,56 @@ class NexusAPI:
                 existing roles
         """
         # Get existing user data JSON
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/security/users",
-            auth=self.auth,
-            timeout=_REQUEST_TIMEOUT,
+        # The userId parameter is a search term, so the results may still
+        # include other users
+        response = self._request(
+            "GET",
+            self._users_url,
+            params={"userId": "anonymous"},
         )
         users = response.json()
-        for user in users:
-            if user["userId"] == "anonymous":
-                anonymous_user = user
-                break
+        anonymous_user = next(
+            (user for user in users if user["userId"] == "anonymous"), None
+        )
+        if anonymous_user is None:
+            logger.error("User anonymous not found")
+            return
 
         # Change roles
         anonymous_user["roles"] = roles
 
         # Push changes to Nexus
-        response = requests.put(
-            f"{self.nexus_api_root}/v1/security/users/{anonymous_user['userId']}",
-            auth=self.auth,
+        response = self._request(
+            "PUT",
+            f"{self._users_url}/{anonymous_user['userId']}",
             json=anonymous_user,
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.NO_CONTENT.value:
-            logging.info(f"User {anonymous_user['userId']} roles updated")
+        if code == ResponseCode.NO_CONTENT:
+            logger.info("User %s roles updated", anonymous_user["userId"])
         else:
-            logging.error(
-                f"User {anonymous_user['userId']} role update failed."
-                f"\nStatus code: {code}"
+            logger.error(
+                "User %s role update failed.\nStatus code: %s",
+                anonymous_user["userId"],
+                code,
             )
-            logging.error(response.content)
+            _log_response_body(response)
 
     def test_auth(self) -> bool:
         """Use list users endpoint to test authentication"""
-        response = requests.get(
-            f"{self.nexus_api_root}/v1/security/users",
-            auth=self.auth,
+        response = self._request(
+            "GET",
+            self._users_url,
             params={"userId": "admin"},
-            timeout=_REQUEST_TIMEOUT,
         )
         code = response.status_code
-        if code == ResponseCode.OK.value:
-            logging.info("API Authentication test passed")
+        if code == ResponseCode.OK:
+            logger.info("API Authentication test passed")
             return True
-        elif code in [ResponseCode.UNAUTHORIZED.value, ResponseCode.FORBIDDEN.value]:
-            logging.error("API Authentication test failed")
+        elif code in _AUTH_FAILURE_CODES:
+            logger.error("API Authentication test failed")
             return False
         else:
-            logging.error(f"API Authentication test inconclusive.\nStatus code:{code}")
-            logging.error(response.content)
+            logger.error("API Authentication test inconclusive.\nStatus code:%s", code)
+            _log_response_body(response)
             return False